@@ -4,21 +4,26 @@ Hodge-Vegas Execution Engine
 Orchestrates data fetching, opportunity scanning, and trade execution.
 """
 
+import asyncio
+import heapq
+import logging
+import logging.handlers
+import queue
 import time
 import uuid
-import requests
-import pandas as pd
+import aiohttp
+import orjson
 import os
 import base64
-from cryptography.hazmat.primitives import serialization, hashes
-from cryptography.hazmat.primitives.asymmetric import padding
-from fuzzywuzzy import fuzz
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from collections import OrderedDict
+from functools import cache, lru_cache
+from rapidfuzz import fuzz
 
 # Import Math Engine
 from math_engine import GaussianPricingModel, HodgeGraphModel # 新增导入
 
+logger = logging.getLogger("hodge_vegas")
+
 # ==============================================================================
 # CONFIGURATION
 # ==============================================================================
@@ -31,6 +36,7 @@ class Config:
     SEC_FILE = "seckey.key"
     
     # Strategy Controls
+    POLL_INTERVAL_SECS = 30 # Pause between scans
     DRY_RUN = False         # Set True for simulation, False for Real Money
     ENABLE_TAKER = True     # Allow aggressive buying
     ENABLE_MAKER = True     # Allow passive quoting
@@ -43,69 +49,179 @@ class Config:
     # Only trade if Vegas implies a much higher win probability than Kalshi
     MIN_EDGE_CENTS = 3.0    # Minimum price discrepancy
     MIN_ROI_PCT = 8.0       # Minimum Return on Investment
+    TOP_K = 5               # Opportunities reported per scan (ranked by edge)
     
     # Fees
     TAKER_FEE = 0.0175
 
+    # Connection Pool
+    POOL_SIZE = 32          # Max pooled keep-alive connections per host
+    KEEPALIVE_SECS = 60     # Idle time before a pooled connection is dropped
+
+    # Request Signing
+    # Window (ms) in which GETs to the same path share one signature. Off until
+    # Kalshi confirms it accepts timestamps that old; 1000 would enable it.
+    GET_SIG_REUSE_MS = 0
+
+    # Market Matching
+    MIN_MATCH_SCORE = 80    # Fuzzy score (0-100) to join a Kalshi market to a Vegas team
+
+    # Caching
+    GAME_CACHE_SIZE = 1024  # Parsed + priced Vegas lines remembered across ticks
+
+def setup_logging():
+    """
+    Routes the engine logger through a QueueHandler so callers never block on
+    stdout; a background QueueListener thread does the actual writes.
+    Returns the listener, which the caller must stop() on shutdown to flush.
+    """
+    log_queue = queue.SimpleQueue()
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, console)
+
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    return listener
+
+def _parse_json(raw: bytes, empty):
+    """orjson (SIMD, Rust) in place of stdlib json; `empty` is returned for a blank body."""
+    return orjson.loads(raw) if raw else empty
+
+@cache
+def _load_keys():
+    """Parses Config.KEY_FILE (KEY="value" per line) once per process."""
+    with open(Config.KEY_FILE, 'r') as f:
+        return {
+            k.strip(): v.strip().strip('"').strip("'")
+            for k, v in (line.split('=', 1) for line in f if '=' in line)
+        }
+
 # ==============================================================================
 # API ADAPTER
 # ==============================================================================
 class KalshiAdapter:
     """Handles secure RSA-signed communication with the Kalshi Exchange."""
     
+    # Retry policy (mirrors the old urllib3 Retry: total=3, backoff_factor=0.5).
+    # Like urllib3's default allowed_methods, only idempotent requests are retried;
+    # an order POST is retried only if the connection was never established.
+    MAX_RETRIES = 3
+    BACKOFF_FACTOR = 0.5
+    RETRY_STATUS = {500, 502, 503}
+    RETRY_METHODS = {"GET"}
+
     def __init__(self):
-        self.session = requests.Session()
-        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503])
-        self.session.mount('https://', HTTPAdapter(max_retries=retries))
-        
         self.key_id = self._load_key_id()
         self.private_key = self._load_private_key()
 
+        # Signing primitives are immutable config; build them once, not per request
+        # (cryptography is imported lazily: only an adapter that signs needs it)
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+        self._pss = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+        self._hash = hashes.SHA256()
+        self._path_prefix = "/trade-api/v2"
+        # Conditional GET state, keyed on (endpoint, params)
+        self._etags: dict = {}
+        self._last_body: dict = {}
+
+        # Per-instance LRU: (method, path, window) -> (ts, signature)
+        self._sign_window = lru_cache(maxsize=32)(self._sign_window_uncached)
+
+        # Opened last so a credential failure above leaves nothing to close.
+        # Must be constructed inside a running event loop; shared by every request
+        # (Kalshi and The Odds API) so TLS sessions are reused across scans
+        connector = aiohttp.TCPConnector(
+            limit=Config.POOL_SIZE * 2, limit_per_host=Config.POOL_SIZE,
+            keepalive_timeout=Config.KEEPALIVE_SECS
+        )
+        self.session = aiohttp.ClientSession(connector=connector, headers={"Connection": "keep-alive"})
+
     def _load_key_id(self):
         if not os.path.exists(Config.KEY_FILE):
             raise FileNotFoundError(f"Key file missing: {Config.KEY_FILE}")
-        with open(Config.KEY_FILE, 'r') as f:
-            for line in f:
-                if 'KALSHI_KEY_ID' in line:
-                    return line.split('=')[1].strip().strip('"').strip("'")
-        return None
+        return _load_keys().get('KALSHI_KEY_ID')
 
     def _load_private_key(self):
         if not os.path.exists(Config.SEC_FILE):
             raise FileNotFoundError(f"Secret key missing: {Config.SEC_FILE}")
+        from cryptography.hazmat.primitives import serialization
         with open(Config.SEC_FILE, "rb") as f:
             return serialization.load_pem_private_key(f.read(), password=None)
 
     def _sign(self, method, path, ts):
         msg = f"{ts}{method}{path}".encode('utf-8')
-        sig = self.private_key.sign(msg, padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH), hashes.SHA256())
+        sig = self.private_key.sign(msg, self._pss, self._hash)
         return base64.b64encode(sig).decode('utf-8')
 
-    def req(self, method, endpoint, params=None, json_data=None):
-        ts = str(int(time.time() * 1000))
-        path_sign = f"/trade-api/v2{endpoint}"
-        headers = {
-            "KALSHI-API-KEY": self.key_id,
-            "KALSHI-API-SIGNATURE": self._sign(method, path_sign, ts),
-            "KALSHI-API-TIMESTAMP": ts,
-            "Content-Type": "application/json"
-        }
+    def _sign_window_uncached(self, method, path, window):
+        ts = str(window * Config.GET_SIG_REUSE_MS)
+        return ts, self._sign(method, path, ts)
+
+    def _signature(self, method, path):
+        """
+        Returns (ts, signature). Orders are always freshly signed; GETs reuse the
+        signature of the current GET_SIG_REUSE_MS window, stamped with the window start.
+        """
+        now = int(time.time() * 1000)
+        if method != "GET" or Config.GET_SIG_REUSE_MS <= 0:
+            ts = str(now)
+            return ts, self._sign(method, path, ts)
+        return self._sign_window(method, path, now // Config.GET_SIG_REUSE_MS)
+
+    async def close(self):
+        await self.session.close()
+
+    async def req(self, method, endpoint, params=None, json_data=None):
+        path_sign = self._path_prefix + endpoint
         url = Config.BASE_URL + endpoint
-        try:
-            if method == "GET":
-                return self.session.get(url, headers=headers, params=params).json()
-            else:
-                return self.session.post(url, headers=headers, json=json_data).json()
-        except Exception as e:
-            print(f"Network Error: {e}")
-            return {}
-
-    def fetch_markets(self):
-        print("📡 Scanning Kalshi NBA Markets...")
-        data = self.req("GET", "/markets", params={"limit": 100, "series_ticker": "KXNBAGAME"})
+        cache_key = (endpoint, tuple(sorted((params or {}).items()))) if method == "GET" else None
+        idempotent = method in self.RETRY_METHODS
+        for attempt in range(self.MAX_RETRIES + 1):
+            ts, sig = self._signature(method, path_sign)
+            headers = {
+                "KALSHI-API-KEY": self.key_id,
+                "KALSHI-API-SIGNATURE": sig,
+                "KALSHI-API-TIMESTAMP": ts,
+                "Content-Type": "application/json"
+            }
+            if cache_key in self._etags:
+                headers["If-None-Match"] = self._etags[cache_key]
+            try:
+                body = orjson.dumps(json_data) if json_data is not None else None
+                async with self.session.request(method, url, headers=headers, params=params, data=body) as r:
+                    if r.status in self.RETRY_STATUS and idempotent and attempt < self.MAX_RETRIES:
+                        await asyncio.sleep(self.BACKOFF_FACTOR * 2 ** attempt)
+                        continue
+                    if r.status == 304:
+                        return self._last_body[cache_key]
+                    data = _parse_json(await r.read(), {})
+                    if cache_key and r.status == 200 and r.headers.get("ETag"):
+                        self._etags[cache_key] = r.headers["ETag"]
+                        self._last_body[cache_key] = data
+                    return data
+            except aiohttp.ClientConnectionError as e:
+                # ClientConnectorError = failed to connect, so the request was never sent
+                retryable = idempotent or isinstance(e, aiohttp.ClientConnectorError)
+                if retryable and attempt < self.MAX_RETRIES:
+                    await asyncio.sleep(self.BACKOFF_FACTOR * 2 ** attempt)
+                    continue
+                logger.warning("Network Error: %s", e)
+                return {}
+            except Exception as e:
+                logger.warning("Network Error: %s", e)
+                return {}
+        return {}
+
+    async def fetch_markets(self):
+        logger.info("📡 Scanning Kalshi NBA Markets...")
+        data = await self.req("GET", "/markets", params={"limit": 100, "series_ticker": "KXNBAGAME"})
         return [m for m in data.get('markets', []) if m.get('status') == 'active']
 
-    def execute_order(self, ticker, action, price, count):
+    async def execute_order(self, ticker, action, price, count):
         if Config.DRY_RUN:
             return {"status": "simulated", "id": "sim-001"}
         
@@ -113,67 +229,204 @@ class KalshiAdapter:
             "ticker": ticker, "action": action, "type": "limit", "side": "yes",
             "count": count, "yes_price": price, "client_order_id": str(uuid.uuid4())
         }
-        print(f"💸 EXECUTING: {action.upper()} {count}x {ticker} @ {price} cents")
-        return self.req("POST", "/portfolio/orders", json_data=payload)
+        logger.info("💸 EXECUTING: %s %dx %s @ %d cents", action.upper(), count, ticker, price)
+        return await self.req("POST", "/portfolio/orders", json_data=payload)
 
 # ==============================================================================
 # STRATEGY & ORCHESTRATION
 # ==============================================================================
-def run_strategy():
+def parse_vegas_game(game):
+    """
+    Extracts the pricing inputs from one Odds API event.
+    Returns None if the bookmaker is missing either the h2h or spreads market.
+    """
+    if not game.get('bookmakers'): return None
+    bk = game['bookmakers'][0]
+    markets = {m['key']: m.get('outcomes', []) for m in bk.get('markets', [])}
+    ml = {o['name']: o['price'] for o in markets.get('h2h', [])}
+    points = {o['name']: o.get('point') for o in markets.get('spreads', [])}
+
+    home, away = game.get('home_team'), game.get('away_team')
+    if home not in ml or away not in ml or points.get(home) is None: return None
+
+    # Lower American price = favorite (e.g. -200 vs +170)
+    fav, dog = (home, away) if ml[home] <= ml[away] else (away, home)
+    return {
+        'home': home, 'away': away, 'fav': fav, 'dog': dog,
+        'spread': -points[home] if fav == home else points[home],  # Favorite's margin
+        'ml_fav': ml[fav], 'ml_dog': ml[dog],
+        'home_margin': -points[home],  # Home - Away (Vegas expectation)
+    }
+
+@lru_cache(maxsize=4096)
+def _sim(a: str, b: str) -> float:
+    """Cached team-name similarity. Callers pass names already lowercased/stripped."""
+    return fuzz.partial_ratio(a, b)
+
+def group_by_event(markets):
+    """Groups Kalshi markets by event_ticker (one market per team in a game)."""
+    events = {}
+    for m in markets:
+        events.setdefault(m.get('event_ticker'), []).append(m)
+    return events
+
+def _best_side(team, event_markets):
+    """Index of the market whose YES side is `team`; None if below threshold or tied."""
+    team = team.lower().strip()
+    scores = [_sim(team, m.get('yes_sub_title', '').lower().strip()) for m in event_markets]
+    best = max(scores, default=0)
+    if best < Config.MIN_MATCH_SCORE or scores.count(best) > 1: return None
+    return scores.index(best)
+
+def match_market(game, events):
+    """
+    Returns the Kalshi market for the favorite's YES side in this game, or None.
+    An event only matches when home and away each map to a different one of its
+    markets; ambiguous matches (ties, or several fitting events) are rejected.
+    """
+    found = None
+    for event_markets in events.values():
+        home = _best_side(game['home'], event_markets)
+        away = _best_side(game['away'], event_markets)
+        if home is None or away is None or home == away: continue
+        if found is not None: return None
+        found = event_markets[home if game['fav'] == game['home'] else away]
+    return found
+
+def evaluate_opportunity(game, market):
+    """Edge/ROI check for one matched game. Returns the opportunity dict or None."""
+    ask = market['yes_ask']
+    edge = game['fair_value'] - ask
+    roi = (edge - Config.TAKER_FEE * 100.0) / ask * 100.0
+    if edge < Config.MIN_EDGE_CENTS or roi < Config.MIN_ROI_PCT: return None
+
+    logger.info(
+        "%s\n[OPPORTUNITY DETECTED]\nEvent: NBA - %s @ %s  (%s)\nImplied Probability (Vegas): %.1f%%\n"
+        "Market Price (Kalshi): %.1f¢\nEdge: +%.1f%%  |  ROI: %.1f%%",
+        "-" * 60, game['away'], game['home'], market['ticker'], game['fair_value'], ask, edge, roi
+    )
+    return {
+        'ticker': market['ticker'], 'event': f"{game['away']} @ {game['home']}", 'team': game['fav'],
+        'fair_value': game['fair_value'], 'yes_ask': ask, 'edge_cents': edge, 'roi': roi,
+    }
+
+# (event id, bookmaker last_update) -> parsed + priced game; insertion-ordered for LRU eviction
+_game_cache = OrderedDict()
+
+def parse_and_price(vegas_data):
+    """
+    Runs parse_vegas_game + GaussianPricingModel.price_games over the slate,
+    skipping both for events whose line hasn't moved since a prior tick.
+    """
+    games, fresh = [], []
+    for raw in vegas_data:
+        bk = (raw.get('bookmakers') or [{}])[0]
+        key = (raw.get('id'), bk.get('last_update'))
+        game = _game_cache.get(key)
+        if game is not None:
+            _game_cache.move_to_end(key)
+        else:
+            game = parse_vegas_game(raw)
+            if not game: continue
+            fresh.append((key, game))
+        games.append(game)
+
+    # Price only the new/changed lines, still in one native pass
+    if fresh:
+        mu, sigma, fair_values = GaussianPricingModel.price_games(
+            [g['spread'] for _, g in fresh], [g['ml_fav'] for _, g in fresh], [g['ml_dog'] for _, g in fresh]
+        )
+        for (key, g), m, s, fv in zip(fresh, mu, sigma, fair_values):
+            g['mu'], g['sigma'], g['fair_value'] = float(m), float(s), float(fv)
+            if key[0] is None or key[1] is None: continue  # No identity to cache under
+            _game_cache[key] = g
+            if len(_game_cache) > Config.GAME_CACHE_SIZE:
+                _game_cache.popitem(last=False)
+    return games
+
+async def fetch_vegas(session, odds_key):
+    logger.info("📡 Fetching Vegas Consensus...")
+    try:
+        async with session.get(
+            "https://api.the-odds-api.com/v4/sports/basketball_nba/odds",
+            params={'apiKey': odds_key, 'regions': 'us', 'markets': 'h2h,spreads',
+                    'bookmakers': 'draftkings', 'oddsFormat': 'american'}
+        ) as r:
+            return _parse_json(await r.read(), [])
+    except Exception as e:
+        logger.warning("Network Error: %s", e)
+        return []
+
+async def run_strategy(max_scans=None):
+    """
+    Polls scan() every POLL_INTERVAL_SECS (forever unless max_scans is given).
+    One adapter lives across ticks so its pooled connections, ETag cache and
+    signature cache carry over from scan to scan.
+    """
     # 1. Initialize
     try:
         kalshi = KalshiAdapter()
     except Exception as e:
-        print(f"❌ Init Failed: {e}")
+        logger.error("❌ Init Failed: %s", e)
         return
+    try:
+        n = 0
+        while max_scans is None or n < max_scans:
+            if n: await asyncio.sleep(Config.POLL_INTERVAL_SECS)
+            await scan(kalshi)
+            n += 1
+    finally:
+        await kalshi.close()
 
+async def scan(kalshi):
     # 2. Fetch External Odds (The Odds API)
     # Note: In production, load this key from env vars or file
     ODDS_KEY = "YOUR_ODDS_API_KEY_HERE" 
-    try:
-        with open(Config.KEY_FILE, 'r') as f:
-            for line in f:
-                if 'ODDS_API_KEY' in line: ODDS_KEY = line.split('=')[1].strip().strip('"')
-    except: pass
-
-    print("📡 Fetching Vegas Consensus...")
-    vegas_data = requests.get(
-        "https://api.the-odds-api.com/v4/sports/basketball_nba/odds",
-        params={'apiKey': ODDS_KEY, 'regions': 'us', 'markets': 'h2h,spreads', 
-                'bookmakers': 'draftkings', 'oddsFormat': 'american'}
-    ).json()
-
-    kalshi_markets = kalshi.fetch_markets()
+    try: ODDS_KEY = _load_keys().get('ODDS_API_KEY', ODDS_KEY)
+    except OSError: pass
+
+    # Both feeds are independent: overlap their round trips
+    kalshi_markets, vegas_data = await asyncio.gather(
+        kalshi.fetch_markets(), fetch_vegas(kalshi.session, ODDS_KEY)
+    )
     opportunities = []
-    # ... (fetch vegas_data logic) ...
-    
+
+    if not isinstance(vegas_data, list): vegas_data = []  # API error payloads are dicts
+    # Parse + price (unchanged lines come straight from the cache)
+    games = parse_and_price(vegas_data)
+
     # --- NEW: HODGE DECOMPOSITION ANALYSIS ---
     # Prepare data for graph
-    game_flows = []
-    for g in vegas_data:
-        # Extract home_team, away_team, and spread...
-        # This is pseudo-code, adjust to actual API structure
-        # game_flows.append({'home': 'LAL', 'away': 'GSW', 'spread': 5.5})
-        pass 
+    game_flows = [{'home': g['home'], 'away': g['away'], 'spread': g['home_margin']} for g in games]
     
     if game_flows:
-        print("🌀 Running Discrete Hodge Decomposition...")
+        logger.info("🌀 Running Discrete Hodge Decomposition...")
         hodge_analysis = HodgeGraphModel.compute_market_inconsistency(game_flows)
-        print(f"   Market Curl Energy (Inefficiency): {hodge_analysis['total_curl_energy']:.2f}")
+        logger.info("   Market Curl Energy (Inefficiency): %.2f", hodge_analysis['total_curl_energy'])
         if hodge_analysis['total_curl_energy'] > 100:
-            print("   🚨 HIGH INEFFICIENCY DETECTED: Cyclic Arbitrage opportunity present!")
+            logger.warning("   🚨 HIGH INEFFICIENCY DETECTED: Cyclic Arbitrage opportunity present!")
 
     # 3. Core Loop: Compare Physics Model vs Market Price
-    for game in vegas_data:
-        # (Simplified Extraction Logic for brevity)
-        if not game.get('bookmakers'): continue
-        bk = game['bookmakers'][0]
-        
-        # ... [Data Parsing Logic would go here] ...
-        # For the repo, we demonstrate the loop structure
-        pass 
+    events = group_by_event(kalshi_markets)
+    for game in games:
+        market = match_market(game, events)
+        if not market or not market.get('yes_ask'): continue
+
+        opp = evaluate_opportunity(game, market)
+        if opp: opportunities.append(opp)
+
+    # 4. Rank: O(n log k) partial selection of the best K instead of a full sort
+    top = heapq.nlargest(Config.TOP_K, opportunities, key=lambda o: o['edge_cents'])
+    for rank, opp in enumerate(top, 1):
+        logger.info("   #%d %s (%s): edge %.1f¢ | ROI %.1f%%", rank, opp['event'], opp['ticker'],
+                    opp['edge_cents'], opp['roi'])
     
-    print("✅ Scan Complete. (See logic implementation for full data parsing)")
+    logger.info("✅ Scan Complete.")
+    return top
 
 if __name__ == "__main__":
-    run_strategy()
\ No newline at end of file
+    listener = setup_logging()
+    try:
+        asyncio.run(run_strategy())
+    finally:
+        listener.stop()
\ No newline at end of file
@@ -7,10 +7,85 @@ Includes:
 """
 
 import numpy as np
-import networkx as nx
-from scipy.stats import norm
+from functools import lru_cache
+from math import erf, erfc, log, sqrt
+from numba import njit
+from scipy import sparse
+from scipy.linalg import cho_factor, cho_solve
+from scipy.sparse.csgraph import connected_components
+from scipy.special import ndtri
 from typing import Tuple, Dict, List
 
+# Sigma bounds for the Gaussian model. Module-level so the numba kernels
+# can freeze them as compile-time constants.
+_MIN_SIGMA = np.float64(5.0)
+_MAX_SIGMA = np.float64(25.0)
+_DEFAULT_SIGMA = np.float64(13.5)
+
+_INV_SQRT2 = 1.0 / sqrt(2.0)
+
+# ==============================================================================
+# 0. NATIVE KERNELS (NUMBA)
+# ==============================================================================
+# fastmath without 'nnan'/'ninf': the kernels rely on NaN/inf comparisons failing
+_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _phi(x: float) -> float:
+    """Standard normal CDF."""
+    return 0.5 * (1.0 + erf(x / sqrt(2.0)))
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _ndtri(p: float) -> float:
+    """Inverse standard normal CDF (Acklam's rational approximation, rel. error < 1.2e-9)."""
+    if not (0.0 < p < 1.0): return np.nan
+    p_low = 0.02425
+    if p < p_low or p > 1.0 - p_low:
+        q = sqrt(-2.0 * log(p if p < p_low else 1.0 - p))
+        x = (((((-7.784894002430293e-03 * q - 3.223964580411365e-01) * q - 2.400758277161838e+00) * q
+               - 2.549732539343734e+00) * q + 4.374664141464968e+00) * q + 2.938163982698783e+00) / \
+            ((((7.784695709041462e-03 * q + 3.224671290700398e-01) * q + 2.445134137142996e+00) * q
+              + 3.754408661907416e+00) * q + 1.0)
+        return x if p < p_low else -x
+    q = p - 0.5
+    r = q * q
+    return (((((-3.969683028665376e+01 * r + 2.209460984245205e+02) * r - 2.759285104469687e+02) * r
+              + 1.383577518672690e+02) * r - 3.066479806614716e+01) * r + 2.506628277459239e+00) * q / \
+           (((((-5.447609879822406e+01 * r + 1.615858368580409e+02) * r - 1.556989798598866e+02) * r
+              + 6.680131188771972e+01) * r - 1.328068155288572e+01) * r + 1.0)
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _american_to_prob(odds: float) -> float:
+    """Same rule as GaussianPricingModel.american_to_prob (decimal odds in (1, 10) included), as a fraction."""
+    if 1.0 < odds < 10.0: return 1.0 / odds
+    if odds > 0: return 100.0 / (odds + 100.0)
+    return -odds / (-odds + 100.0)
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _price_games(spreads, favs, dogs):
+    """
+    Fused solve_parameters + calculate_fair_value over N games.
+    Returns (mu, sigma, fair_value) arrays.
+    """
+    n = spreads.shape[0]
+    mu = np.empty(n)
+    sigma = np.empty(n)
+    fair = np.empty(n)
+    for i in range(n):
+        p_fav = _american_to_prob(favs[i])
+        p_dog = _american_to_prob(dogs[i])
+        total = p_fav + p_dog
+        m = abs(spreads[i])
+        sig = _DEFAULT_SIGMA
+        if total > 0:
+            z = _ndtri(1.0 - p_fav / total)
+            if abs(z) >= 0.01: sig = m / abs(z)
+        if not (_MIN_SIGMA < sig < _MAX_SIGMA): sig = _DEFAULT_SIGMA
+        mu[i] = m
+        sigma[i] = sig
+        fair[i] = _phi(m / sig) * 100.0
+    return mu, sigma, fair
+
 # ==============================================================================
 # 1. CLASSIC QUANT MODEL (GAUSSIAN)
 # ==============================================================================
@@ -20,18 +95,31 @@ class GaussianPricingModel:
     Used for direct arbitrage checks on single games.
     """
     
-    MIN_SIGMA = 5.0
-    MAX_SIGMA = 25.0
-    DEFAULT_SIGMA = 13.5
+    MIN_SIGMA = _MIN_SIGMA
+    MAX_SIGMA = _MAX_SIGMA
+    DEFAULT_SIGMA = _DEFAULT_SIGMA
+
+    @staticmethod
+    def american_to_prob_arr(odds) -> np.ndarray:
+        """
+        Branchless american_to_prob over an array (decimal odds in (1, 10) included).
+        For whole slates only; a single value is far cheaper through american_to_prob.
+        """
+        odds = np.asarray(odds, dtype=np.float64)
+        decimal_mask = (odds > 1.0) & (odds < 10.0)
+        pos_mask = (odds > 0) & ~decimal_mask
+        # Both branches are evaluated everywhere; the masked-out ones may divide by zero
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(decimal_mask, 100.0 / odds,
+                            np.where(pos_mask, 10000.0 / (odds + 100.0), -odds * 100.0 / (-odds + 100.0)))
 
     @staticmethod
     def american_to_prob(odds: float) -> float:
-        try:
-            odds = float(odds)
-            if 1.0 < odds < 10.0: return (1.0 / odds) * 100.0
-            if odds > 0: return (100.0 / (odds + 100.0)) * 100.0
-            else: return (-odds / (-odds + 100.0)) * 100.0
-        except: return 0.0
+        try: odds = float(odds)
+        except (TypeError, ValueError): return 0.0
+        if 1.0 < odds < 10.0: return (1.0 / odds) * 100.0
+        if odds > 0: return (100.0 / (odds + 100.0)) * 100.0
+        return (-odds / (-odds + 100.0)) * 100.0
 
     @staticmethod
     def remove_vig(prob_fav: float, prob_dog: float) -> float:
@@ -48,7 +136,7 @@ class GaussianPricingModel:
         
         mu = abs(spread)
         try:
-            z = norm.ppf(1 - true_p)
+            z = ndtri(1 - true_p)
             if abs(z) < 0.01: sigma = cls.DEFAULT_SIGMA
             else: sigma = abs(0 - mu) / abs(z)
         except: sigma = cls.DEFAULT_SIGMA
@@ -58,7 +146,20 @@ class GaussianPricingModel:
 
     @staticmethod
     def calculate_fair_value(mu: float, sigma: float) -> float:
-        return norm.sf((0 - mu) / sigma) * 100.0
+        # sf(x) = 0.5 * erfc(x / sqrt(2)): plain C call, no scipy dispatch for scalars
+        return 0.5 * erfc((0 - mu) / sigma * _INV_SQRT2) * 100.0
+
+    @staticmethod
+    def price_games(spreads, ml_favs, ml_dogs) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        JIT-compiled solve_parameters + calculate_fair_value over N games.
+        Returns (mu, sigma, fair_value) arrays.
+        """
+        return _price_games(
+            np.ascontiguousarray(spreads, dtype=np.float64),
+            np.ascontiguousarray(ml_favs, dtype=np.float64),
+            np.ascontiguousarray(ml_dogs, dtype=np.float64),
+        )
 
 
 # ==============================================================================
@@ -78,68 +179,77 @@ class HodgeGraphModel:
     If ||Curl|| is high, the market is inefficient/irrational.
     """
     
-    @staticmethod
-    def compute_market_inconsistency(games: List[Dict]) -> Dict:
+    @classmethod
+    def compute_market_inconsistency(cls, games: List[Dict]) -> Dict:
         """
         Input: List of games [{'home': 'LAL', 'away': 'GSW', 'spread': 5.5}, ...]
         Output: Global Rankings (Gradient) and Market Inconsistency (Curl Energy)
+
+        Results are memoized on the slate, so treat the returned dict as read-only.
         """
-        # 1. Build the Graph
-        G = nx.Graph()
-        teams = set()
-        
+        key = tuple(sorted((g['home'], g['away'], round(float(g['spread']), 2)) for g in games))
+        return cls._decompose(key)
+
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _decompose(slate: Tuple[Tuple[str, str, float], ...]) -> Dict:
+        games = [{'home': h, 'away': a, 'spread': spread} for h, a, spread in slate]
+        # 1. Build the Edge List (one edge per game, oriented Away -> Home)
         # 'spread' is defined as Home - Away margin (Vegas expectation)
+        # If Home is favored by 5, flow from Away -> Home is +5
+        idx = {}
         for g in games:
-            h, a, spread = g['home'], g['away'], g['spread']
-            teams.add(h)
-            teams.add(a)
-            # Add edge with 'flow' = spread
-            # If Home is favored by 5, flow from Away -> Home is +5
-            G.add_edge(a, h, weight=spread)
-
-        node_list = list(teams)
+            idx.setdefault(g['away'], len(idx))
+            idx.setdefault(g['home'], len(idx))
+
+        node_list = list(idx)
         n = len(node_list)
         if n < 2: return {"error": "Not enough data"}
 
+        # Structure-of-Arrays edge storage (contiguous int32 node ids)
+        m = len(games)
+        u_idx = np.fromiter((idx[g['away']] for g in games), dtype=np.int32, count=m)
+        v_idx = np.fromiter((idx[g['home']] for g in games), dtype=np.int32, count=m)
+        weights = np.fromiter((g['spread'] for g in games), dtype=np.float64, count=m)
+
         # 2. Construct Matrices
-        # Index mapping
-        idx = {node: i for i, node in enumerate(node_list)}
-        
-        # B: Divergence Vector (Net flow into each node)
-        div = np.zeros(n)
-        for u, v, data in G.edges(data=True):
-            flow = data['weight'] # Flow u -> v
-            div[idx[v]] += flow
-            div[idx[u]] -= flow
-            
-        # L: Graph Laplacian (Unweighted for simple connectivity)
+        # L: Graph Laplacian (Unweighted for simple connectivity), built dense for the
+        # Cholesky solve: degree on the diagonal, -1 per game between each pair
         # We perform regression on pairwise comparisons
-        L = nx.laplacian_matrix(G).toarray()
+        L = np.diag((np.bincount(u_idx, minlength=n) + np.bincount(v_idx, minlength=n)).astype(np.float64))
+        np.add.at(L, (u_idx, v_idx), -1.0)
+        np.add.at(L, (v_idx, u_idx), -1.0)
+
+        # Divergence Vector (Net flow into each node): inflow - outflow in two bincount passes
+        div = np.bincount(v_idx, weights, minlength=n) - np.bincount(u_idx, weights, minlength=n)
         
         # 3. Hodge Decomposition (Solve L * s = div)
-        # Since L is singular (sum of rows = 0), we use Pseudo-Inverse
-        L_pinv = np.linalg.pinv(L)
-        s = L_pinv @ div # s is the "Global Potential" (Rating) vector
+        # L is singular (sum of rows = 0): gauge-fix by pinning s[0] = 0 and
+        # Cholesky-solve the reduced SPD system (eps keeps disconnected slates PD)
+        c, low = cho_factor(L[1:, 1:] + 1e-9 * np.eye(n - 1))
+        s = np.concatenate([[0.0], cho_solve((c, low), div[1:])]) # s is the "Global Potential" (Rating) vector
+
+        # A typical night is disconnected (each team plays once), so the gauge is
+        # per component: zero-mean each one, as the pseudo-inverse solution is.
+        # Curl is invariant under these shifts.
+        adjacency = sparse.coo_matrix((np.ones(m), (u_idx, v_idx)), shape=(n, n))
+        _, labels = connected_components(adjacency, directed=False)
+        s -= (np.bincount(labels, s) / np.bincount(labels))[labels]
         
         # 4. Calculate Residuals (Curl Component)
         # Curl_ij = Observed_ij - (s_j - s_i)
-        curl_energy = 0.0
-        inconsistencies = []
+        gradient_flow = s[v_idx] - s[u_idx] # Expected flow based on global rank
+        residuals = weights - gradient_flow
+        curl_energy = residuals @ residuals
         
-        for u, v, data in G.edges(data=True):
-            observed_flow = data['weight']
-            gradient_flow = s[idx[v]] - s[idx[u]] # Expected flow based on global rank
-            
-            residual = observed_flow - gradient_flow
-            curl_energy += residual ** 2
-            
-            if abs(residual) > 3.0: # If discrepancy > 3 points
-                inconsistencies.append({
-                    "matchup": f"{u} vs {v}",
-                    "vegas_spread": observed_flow,
-                    "hodge_implied": gradient_flow,
-                    "discrepancy": residual
-                })
+        # Only the (few) outlier edges are visited in Python
+        outliers = np.nonzero(np.abs(residuals) > 3.0)[0] # If discrepancy > 3 points
+        inconsistencies = [{
+            "matchup": f"{node_list[u_idx[i]]} vs {node_list[v_idx[i]]}",
+            "vegas_spread": float(weights[i]),
+            "hodge_implied": float(gradient_flow[i]),
+            "discrepancy": float(residuals[i])
+        } for i in outliers]
 
         # Normalize rankings
         rankings = {node_list[i]: float(s[i]) for i in range(n)}
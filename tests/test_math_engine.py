@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from math_engine import HodgeGraphModel  # noqa: E402
+
+
+def _pinv_potentials(games):
+    """Reference solution: s = pinv(B^T B) @ B^T w with B the Away -> Home incidence."""
+    teams = sorted({g['home'] for g in games} | {g['away'] for g in games})
+    idx = {t: i for i, t in enumerate(teams)}
+    B = np.zeros((len(games), len(teams)))
+    for e, g in enumerate(games):
+        B[e, idx[g['away']]] = -1.0
+        B[e, idx[g['home']]] = 1.0
+    w = np.array([g['spread'] for g in games], dtype=np.float64)
+    s = np.linalg.pinv(B.T @ B) @ (B.T @ w)
+    residuals = w - B @ s
+    return {t: s[idx[t]] for t in teams}, float(residuals @ residuals)
+
+
+def test_disconnected_slate_with_odd_cycle_matches_pinv():
+    games = [
+        # Two isolated matchups, as on a normal one-game-per-team night
+        {'home': 'B', 'away': 'A', 'spread': 5.0},
+        {'home': 'D', 'away': 'C', 'spread': 3.0},
+        # Inconsistent triangle: E < F < G < E
+        {'home': 'F', 'away': 'E', 'spread': 2.0},
+        {'home': 'G', 'away': 'F', 'spread': 4.0},
+        {'home': 'E', 'away': 'G', 'spread': 5.0},
+    ]
+    expected, expected_curl = _pinv_potentials(games)
+
+    result = HodgeGraphModel.compute_market_inconsistency(games)
+
+    rankings = result['hodge_rankings']
+    assert set(rankings) == set(expected)
+    for team, s in expected.items():
+        assert abs(rankings[team] - s) < 1e-6, team
+    assert list(rankings) == sorted(expected, key=expected.get, reverse=True)
+    assert abs(result['total_curl_energy'] - expected_curl) < 1e-6